@@ -1,6 +1,14 @@
 import os
 from typing import Dict
-from argparser import build_parser, handle_docs_command, handle_query_command
+from argparser import (
+    build_parser,
+    handle_classify_command,
+    handle_docs_command,
+    handle_query_command,
+    is_table_lookup,
+)
+from bias_table import BiasTable
+from collection_stats import CollectionStats
 from naive_bayes import NaiveBayes
 from document_parser import Document, DocumentParser
 from tantivy_search import TantivySearch
@@ -79,30 +87,57 @@ def test_sentiment(vanila_doc_parser, bayes):
     print("Political sentiment strenght: " + str(sentiment_stats[2]))
 
 
-if __name__ == "__main__":
-    # NOTE: Only have to do this once
-    # import nltk
-    # nltk.download('punkt')
-
-    vanila_doc_parser = DocumentParser("../Article-Bias-Prediction/data/")
-    train = vanila_doc_parser.read_split("train")
-    test = vanila_doc_parser.read_split("test")
-
+def load_bayes(vanila_doc_parser, load_params: bool = True) -> NaiveBayes:
+    """Loads the naive bayes model, the train split is only read if the model has to be trained.
+    With `load_params=False` the model is only good for `params_checksum`."""
     bayes = NaiveBayes(os.path.join(DATA_PATH, "vanila_bayes"), vanila_doc_parser)
-    bayes.load_or_create_sentiment_stats(train)
+    if not load_params:
+        return bayes
+    if bayes.params_checksum() is None:
+        bayes.load_or_create_sentiment_stats(vanila_doc_parser.read_split("train"))
     bayes.load_params_or_train()
 
-    # compare_other_bayes(bayes, test)
+    # compare_other_bayes(bayes, vanila_doc_parser.read_split("test"))
     # test_sentiment(vanila_doc_parser, bayes)
+    return bayes
+
 
+def load_index(vanila_doc_parser, catalog) -> TantivySearch:
+    """Opens the tantivy index, building it (and the collection stats) if it doesn't exist"""
     ts = TantivySearch("vanila")
     if not ts.index_exists:
         ts.add_documents(vanila_doc_parser)
+        catalog.update(vanila_doc_parser)
+    return ts
+
+
+if __name__ == "__main__":
+    # NOTE: Only have to do this once
+    # import nltk
+    # nltk.download('punkt')
+
+    vanila_doc_parser = DocumentParser("../Article-Bias-Prediction/data/")
+    catalog = CollectionStats(os.path.join(DATA_PATH, "collection_stats", "vanila"))
 
     args = build_parser().parse_args()
-    print()  # print blank line
     match args.command:
         case "docs":
-            handle_docs_command(args, vanila_doc_parser.read_all())
+            # docs only need the collection stats, so no splits are read and no models are loaded
+            if args.docs_command == "stats" and (not catalog.exists or args.refresh):
+                catalog.update(vanila_doc_parser)
+            print()  # print blank line
+            handle_docs_command(args, vanila_doc_parser, catalog)
         case "query":
-            handle_query_command(args, bayes, ts)
+            bayes = load_bayes(vanila_doc_parser)
+            ts = load_index(vanila_doc_parser, catalog)
+            table = BiasTable(os.path.join(DATA_PATH, "bias_table", "vanila"))
+            print()  # print blank line
+            handle_query_command(args, bayes, ts, table)
+        case "classify-corpus":
+            if not is_table_lookup(args):
+                # read everything up front so training reuses the parsed train split
+                vanila_doc_parser.read_all()
+            bayes = load_bayes(vanila_doc_parser, load_params=not is_table_lookup(args))
+            table = BiasTable(os.path.join(DATA_PATH, "bias_table", "vanila"))
+            print()  # print blank line
+            handle_classify_command(args, bayes, vanila_doc_parser, table)
@@ -1,13 +1,18 @@
 """
 A command line application with the following behavior/capabilities:
-- `docs stats` - print out stats about the collection, or a specific document
+- `docs stats` - print out stats about the collection (optionally filtered by split, source, topic,
+  or bias), or a specific document
 - `docs show` - print out the contents of a specific document
+- `classify-corpus` - classify every document and save the results to the bias table
 """
 import argparse
 import json
+import os
 from typing import Dict
 
-from document_parser import Document
+from bias_table import BiasTable, content_hash
+from collection_stats import CollectionStats
+from document_parser import SPLITS, Document, DocumentParser
 from naive_bayes import NaiveBayes
 from tantivy_search import TantivySearch
 
@@ -26,6 +31,17 @@ def build_parser():
     )
     docs.add_argument("docs_command", choices=["stats", "show"])
     docs.add_argument("--id", help="document id")
+    docs.add_argument("--split", help="only count documents in this split", choices=SPLITS)
+    docs.add_argument("--source", help="only count documents from this source")
+    docs.add_argument("--topic", help="only count documents with this topic")
+    docs.add_argument(
+        "--bias", help="only count documents with this bias", choices=["left", "center", "right"]
+    )
+    docs.add_argument(
+        "--refresh",
+        help="update the collection stats with new or modified documents first",
+        action="store_true",
+    )
 
     query = subparsers.add_parser(
         "query", help="Query models for either sentiment (bayes) or documents (tantivy)"
@@ -61,22 +77,109 @@ def build_parser():
         choices=["left", "right", "center", "none"],
         default="none",
     )
+
+    classify = subparsers.add_parser(
+        "classify-corpus",
+        help="classify every document with naive bayes and save the results to the bias table",
+    )
+    classify.add_argument(
+        "-j", "--jobs", help="number of worker processes (default: cpu count)", type=int
+    )
+    classify.add_argument("--id", help="show the saved prediction for this document id")
+    classify.add_argument(
+        "--min", help="show documents with at least this bias (-1 is left)", type=float
+    )
+    classify.add_argument(
+        "--max", help="show documents with at most this bias (1 is right)", type=float
+    )
     return parser
 
 
-def handle_docs_command(args, docs: Dict[str, Document]):
+def handle_docs_command(args, doc_parser: DocumentParser, catalog: CollectionStats):
     match args.docs_command:
         case "stats":
-            # TODO: more interesting stats.
-            print(f"There are {len(docs)} documents in the collection")
+            if args.id:
+                entry = catalog.get(args.id)
+                if entry is None:
+                    print(f"Document with id {args.id} not found")
+                    return
+                print(entry)
+                return
+            print(
+                format_stats(
+                    catalog.summary(
+                        split=args.split, source=args.source, topic=args.topic, bias=args.bias
+                    )
+                )
+            )
         case "show":
             if not args.id:
                 print("Must provide an id with `doc show`")
                 return
-            if args.id not in docs:
+            path = os.path.join(doc_parser.path, "jsons/", f"{args.id}.json")
+            if not os.path.exists(path):
                 print(f"Document with id {args.id} not found")
                 return
-            print(docs[args.id])
+            print(doc_parser.read_file(path))
+
+
+def format_stats(summary: dict, top: int = 10) -> str:
+    """Formats the output of `CollectionStats.summary`, only the `top` most common sources and
+    topics are shown"""
+    vocabulary = summary["vocabulary"]
+    lines = [
+        f"There are {summary['documents']} documents in the collection",
+        f"Tokens: {summary['tokens']}",
+        f"Vocabulary: {vocabulary if vocabulary is not None else 'n/a for combined filters'}",
+    ]
+    if summary["lengths"]:
+        lengths = summary["lengths"]
+        lines.append(
+            "Document length: "
+            + ", ".join(
+                f"{k} {v:.1f}" if isinstance(v, float) else f"{k} {v}" for k, v in lengths.items()
+            )
+        )
+    for facet, counts in summary["counts"].items():
+        if not counts:
+            continue
+        shown = counts.most_common(top)
+        lines.append(f"\nBy {facet}:")
+        for value, count in shown:
+            lines.append(f"  {value or '(none)':<{WIDTH - 12}}{count:>10}")
+        if len(counts) > len(shown):
+            lines.append(f"  ... and {len(counts) - len(shown)} more")
+    return "\n".join(lines)
+
+
+def is_table_lookup(args) -> bool:
+    """Whether a `classify-corpus` command only reads the bias table, which only needs the
+    model's checksum rather than a loaded model"""
+    return bool(args.id) or args.min is not None or args.max is not None
+
+
+def handle_classify_command(args, bayes: NaiveBayes, doc_parser: DocumentParser, table: BiasTable):
+    if is_table_lookup(args):
+        checksum = bayes.params_checksum()
+        if checksum is None:
+            print("The classifier hasn't been trained yet")
+            return
+    if args.id:
+        row = table.get(args.id, checksum)
+        if row is None:
+            print(f"Document with id {args.id} has not been classified by the current model")
+            return
+        print(row)
+        return
+    if args.min is not None or args.max is not None:
+        low = args.min if args.min is not None else -1.0
+        high = args.max if args.max is not None else 1.0
+        for row in sorted(table.scan(low, high, checksum), key=lambda r: r.bias):
+            print(f"{row.ID}\t{row.label}\t{row.bias:.4f}")
+        return
+    docs = doc_parser.read_all()
+    count = table.update(bayes, docs, args.jobs)
+    print(f"Classified {count} documents, {len(docs) - count} were already up to date")
 
 
 class bcolors:
@@ -91,7 +194,9 @@ class bcolors:
     UNDERLINE = "\033[4m"
 
 
-def handle_query_command(args, bayes: NaiveBayes, tantivy: TantivySearch):
+def handle_query_command(
+    args, bayes: NaiveBayes, tantivy: TantivySearch, table: BiasTable | None = None
+):
     if args.file:
         with open(args.file, "r") as f:
             text = f.read()
@@ -116,7 +221,7 @@ def handle_query_command(args, bayes: NaiveBayes, tantivy: TantivySearch):
                 print(f"Prediction: {(1 - scale[1]) * 100:.2f}% {scale[0]} of center")
         case "tantivy":
             results = tantivy.query(text)
-            results = adjust_rankings(results, args.bias, bayes)
+            results = adjust_rankings(results, args.bias, bayes, table)
             if args.remove:
                 results = [res for res in results if res[1] != args.remove]
             if args.only:
@@ -143,10 +248,16 @@ def handle_query_command(args, bayes: NaiveBayes, tantivy: TantivySearch):
 BOOST_MULTIPLIER = 1.1
 
 
-def adjust_rankings(results, bias: str, cassifier: NaiveBayes):
+def adjust_rankings(results, bias: str, cassifier: NaiveBayes, table: BiasTable | None = None):
     for i in range(len(results)):
         doc, score = results[i]
-        classes = cassifier.predict_doc(Document(content=doc["content"][0]))
+        document = Document(content=doc["content"][0])
+        # use the saved prediction when the table has one from this model for the same content
+        row = table.get(doc["ID"][0], cassifier.checksum) if table is not None else None
+        if row is not None and row.hash == content_hash(document):
+            classes = {"left": row.left, "center": row.center, "right": row.right}
+        else:
+            classes = cassifier.predict_doc(document)
         prediction = most_likely(classes)
         if prediction == bias:
             results[i] = (doc, prediction, score * BOOST_MULTIPLIER)
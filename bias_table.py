@@ -0,0 +1,212 @@
+from dataclasses import dataclass
+from hashlib import md5
+import json
+from multiprocessing import get_context
+import os
+from typing import Dict, Iterator, List, Tuple
+from zlib import crc32
+
+from document_parser import Document
+from naive_bayes import NaiveBayes
+from utils import write_json
+
+# Model used by the worker processes. Set right before the pool is forked so the workers inherit
+# it, the `pr` closure on NaiveBayes can't be pickled.
+_MODEL: NaiveBayes | None = None
+
+# Below this many stale documents it's faster to classify them in process than to fork a pool
+MIN_POOL_DOCS = 500
+# Chunks handed out per worker, more than one so a slow chunk doesn't leave the others idle
+CHUNKS_PER_WORKER = 4
+
+
+@dataclass
+class BiasRow:
+    """The classifier's output for a single document"""
+
+    ID: str
+    hash: str
+    """Content hash of the document when it was classified"""
+    label: str
+    left: float
+    center: float
+    right: float
+    centeredness: float
+    term_weight: float
+
+    @property
+    def bias(self) -> float:
+        """Signed bias on the scale of -1 <= val <= 1, -1 being left, 0 being center, 1 being
+        right. This is the same value the `query bayes` command prints as a percentage."""
+        if self.label == "left":
+            return self.centeredness - 1
+        if self.label == "right":
+            return 1 - self.centeredness
+        return 0.0
+
+
+def content_hash(doc: Document) -> str:
+    """Hash of the part of a document the classifier looks at"""
+    return md5(doc.content.encode()).hexdigest()
+
+
+def _classify_chunk(chunk: List[Tuple[str, str, str]]) -> Dict[str, list]:
+    """Classifies (ID, hash, content) tuples with the inherited model, returns on disk rows"""
+    rows = {}
+    for id, hash, content in chunk:
+        doc = Document(content=content)
+        sentiments = _MODEL.predict_doc(doc)
+        label, centeredness, term_weight = _MODEL.predict_scale_doc(doc, sentiments)
+        rows[id] = [
+            hash,
+            label,
+            sentiments["left"],
+            sentiments["center"],
+            sentiments["right"],
+            centeredness,
+            term_weight,
+        ]
+    return rows
+
+
+class BiasTable:
+    """On disk table of NaiveBayes predictions for every document in the corpus. Rows are split
+    into shards by a hash of the document ID, each shard is a json file that records the checksum
+    of the model that scored it, and the content hash of each document it holds."""
+
+    path: str
+    """Directory the shards are stored in"""
+    num_shards: int
+    shards: Dict[int, dict]
+    """Shards that have been loaded from disk"""
+
+    def __init__(self, path: str, num_shards: int = 16):
+        self.path = path
+        self.shards = {}
+
+        # the number of shards is fixed once a table has been written, otherwise lookups would
+        # look in the wrong shard. Nothing is written until the first shard is saved.
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                self.num_shards = json.load(f)["num_shards"]
+        else:
+            self.num_shards = num_shards
+
+    def _shard_of(self, id: str) -> int:
+        return crc32(id.encode()) % self.num_shards
+
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self.path, f"shard_{shard:03}.json")
+
+    def _load_shard(self, shard: int) -> dict:
+        if shard not in self.shards:
+            path = self._shard_path(shard)
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    self.shards[shard] = json.load(f)
+            else:
+                self.shards[shard] = {"model": None, "rows": {}}
+        return self.shards[shard]
+
+    def _save_shard(self, shard: int, data: dict):
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.exists(meta_path):
+            os.makedirs(self.path, exist_ok=True)
+            write_json(meta_path, {"num_shards": self.num_shards})
+        write_json(self._shard_path(shard), data)
+        self.shards[shard] = data
+
+    def update(self, model: NaiveBayes, docs: Dict[str, Document], jobs: int | None = None) -> int:
+        """Brings the table up to date with the given model and documents. Only documents that
+        are new, whose content changed, or that live in a shard scored by a different model are
+        classified, documents no longer in `docs` are dropped.
+        args:
+            model: trained classifier, `load_params_or_train` must have been called
+            docs: every document in the corpus
+            jobs: number of worker processes, defaults to the number of cpus. Documents are split
+                into chunks across the workers independently of the storage shards, and small
+                updates are classified without a pool.
+        returns: the number of documents that were classified
+        """
+        global _MODEL
+        if model.pr is None or model.checksum is None:
+            raise Exception("Must train classifier before classifying the corpus")
+
+        by_shard: Dict[int, Dict[str, Document]] = {i: {} for i in range(self.num_shards)}
+        for id, doc in docs.items():
+            by_shard[self._shard_of(id)][id] = doc
+
+        stale: List[Tuple[str, str, str]] = []
+        updated: Dict[int, dict] = {}
+        for shard, shard_docs in by_shard.items():
+            data = self._load_shard(shard)
+            rows = data["rows"] if data["model"] == model.checksum else {}
+            kept = {}
+            todo = []
+            for id, doc in shard_docs.items():
+                hash = content_hash(doc)
+                if id in rows and rows[id][0] == hash:
+                    kept[id] = rows[id]
+                else:
+                    todo.append((id, hash, doc.content))
+            stale.extend(todo)
+            if todo or len(kept) != len(data["rows"]) or data["model"] != model.checksum:
+                updated[shard] = {"model": model.checksum, "rows": kept}
+
+        if stale:
+            _MODEL = model
+            try:
+                jobs = jobs or os.cpu_count() or 1
+                if jobs == 1 or len(stale) < MIN_POOL_DOCS:
+                    print(f"Classifying {len(stale)} documents")
+                    rows = _classify_chunk(stale)
+                else:
+                    size = -(-len(stale) // (jobs * CHUNKS_PER_WORKER))
+                    chunks = [stale[i : i + size] for i in range(0, len(stale), size)]
+                    print(f"Classifying {len(stale)} documents with {jobs} workers")
+                    with get_context("fork").Pool(min(jobs, len(chunks))) as pool:
+                        rows = {}
+                        for chunk_rows in pool.imap_unordered(_classify_chunk, chunks):
+                            rows.update(chunk_rows)
+            finally:
+                _MODEL = None
+            for id, row in rows.items():
+                updated[self._shard_of(id)]["rows"][id] = row
+
+        for shard, data in updated.items():
+            self._save_shard(shard, data)
+        return len(stale)
+
+    def get(self, id: str, checksum: str | None = None) -> BiasRow | None:
+        """Looks up the row for a document ID, only reads the shard the ID belongs to
+        args:
+            id: the document ID
+            checksum: if given, only return the row if it was scored by the model with this
+                checksum
+        """
+        data = self._load_shard(self._shard_of(id))
+        if checksum is not None and data["model"] != checksum:
+            return None
+        row = data["rows"].get(id)
+        if row is None:
+            return None
+        return BiasRow(id, *row)
+
+    def scan(
+        self, low: float = -1.0, high: float = 1.0, checksum: str | None = None
+    ) -> Iterator[BiasRow]:
+        """Yields every row with `low <= row.bias <= high`
+        args:
+            low: minimum signed bias, -1 being the most left
+            high: maximum signed bias, 1 being the most right
+            checksum: if given, skip shards that weren't scored by the model with this checksum
+        """
+        for shard in range(self.num_shards):
+            data = self._load_shard(shard)
+            if checksum is not None and data["model"] != checksum:
+                continue
+            for id, row in data["rows"].items():
+                bias_row = BiasRow(id, *row)
+                if low <= bias_row.bias <= high:
+                    yield bias_row
@@ -0,0 +1,283 @@
+from collections import Counter
+from dataclasses import dataclass
+from hashlib import md5
+import json
+import os
+import shutil
+from typing import Dict, List
+from zlib import crc32
+
+from document_parser import SPLITS, DocumentParser
+from utils import write_json
+
+# bump when the layout of catalog.json or the files next to it changes, older catalogs are rebuilt
+CATALOG_VERSION = 2
+# number of files the per document terms are split across
+TERM_SHARDS = 64
+
+# fields that `summary` can filter and break down counts by
+FACETS = ["split", "source", "topic", "bias"]
+
+
+@dataclass
+class DocStats:
+    """Catalog entry for a single document"""
+
+    ID: str
+    mtime: float
+    """Modification time of the document's json file when it was counted"""
+    hash: str
+    """md5 of the document's json file when it was counted"""
+    split: str
+    source: str
+    topic: str
+    bias: str
+    tokens: int
+    terms: int
+    """Number of unique terms in the document"""
+
+
+def _groups(row: list) -> List[str]:
+    """Vocabulary groups a catalog row counts towards"""
+    _, _, split, source, topic, bias = row[:6]
+    groups = ["all", f"source:{source}", f"topic:{topic}", f"bias:{bias}"]
+    if split:
+        groups.append(f"split:{split}")
+    return groups
+
+
+class CollectionStats:
+    """Catalog of collection statistics, built once at ingest and updated incrementally so that
+    stats can be reported without reading any documents. Per document rows (facets and lengths)
+    live in `catalog.json` along with the vocabulary size of each facet value. The vocabularies
+    (document frequency of each term) are kept in one file per group under `vocab/`, and the
+    unique terms of each document in shards under `terms/`. Those are only read when the catalog
+    is updated, and only for the groups and shards a change touches."""
+
+    path: str
+    """Directory the catalog is stored in"""
+    exists: bool
+    """Whether a catalog in the current format has been saved"""
+    docs: Dict[str, list]
+    vocab_sizes: Dict[str, int]
+    """Vocabulary size of the whole collection ("all") and of each facet value ("bias:left")"""
+    vocab: Dict[str, Counter]
+    """Vocabularies loaded during an update"""
+    terms: Dict[int, Dict[str, List[str]]]
+    """Shards of per document terms loaded during an update"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.exists = False
+        self.docs = {}
+        self.vocab_sizes = {}
+        self.vocab = {}
+        self.terms = {}
+        catalog_path = os.path.join(path, "catalog.json")
+        if os.path.exists(catalog_path):
+            with open(catalog_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == CATALOG_VERSION:
+                self.exists = True
+                self.docs = data["docs"]
+                self.vocab_sizes = data["vocab_sizes"]
+            else:
+                print(f"Collection stats in {path} are from an older version, they'll be rebuilt")
+
+    def _group_path(self, group: str) -> str:
+        # facet values can contain any character, so files are named by a hash of the group
+        return os.path.join(self.path, "vocab", f"{md5(group.encode()).hexdigest()}.json")
+
+    def _terms_path(self, shard: int) -> str:
+        return os.path.join(self.path, "terms", f"shard_{shard:03}.json")
+
+    def _load_group(self, group: str) -> Counter:
+        if group not in self.vocab:
+            counts = Counter()
+            path = self._group_path(group)
+            if self.exists and os.path.exists(path):
+                with open(path, "r") as f:
+                    counts = Counter(json.load(f)["counts"])
+            self.vocab[group] = counts
+        return self.vocab[group]
+
+    def _load_terms(self, id: str) -> Dict[str, List[str]]:
+        """Returns the shard of document terms the given ID belongs to"""
+        shard = crc32(id.encode()) % TERM_SHARDS
+        if shard not in self.terms:
+            terms = {}
+            path = self._terms_path(shard)
+            if self.exists and os.path.exists(path):
+                with open(path, "r") as f:
+                    terms = json.load(f)
+            self.terms[shard] = terms
+        return self.terms[shard]
+
+    def _save(self):
+        """Writes the groups and term shards that were loaded (and so possibly changed) during an
+        update, then the catalog itself"""
+        if not self.exists:
+            # the catalog is new or was in an older format, start from empty directories
+            for dir in ["vocab", "terms"]:
+                shutil.rmtree(os.path.join(self.path, dir), ignore_errors=True)
+        os.makedirs(os.path.join(self.path, "vocab"), exist_ok=True)
+        os.makedirs(os.path.join(self.path, "terms"), exist_ok=True)
+
+        for group, counts in self.vocab.items():
+            if counts:
+                write_json(self._group_path(group), {"group": group, "counts": counts})
+                self.vocab_sizes[group] = len(counts)
+            else:
+                if os.path.exists(self._group_path(group)):
+                    os.remove(self._group_path(group))
+                self.vocab_sizes.pop(group, None)
+        for shard, terms in self.terms.items():
+            write_json(self._terms_path(shard), terms)
+        self.vocab = {}
+        self.terms = {}
+
+        write_json(
+            os.path.join(self.path, "catalog.json"),
+            {"version": CATALOG_VERSION, "docs": self.docs, "vocab_sizes": self.vocab_sizes},
+        )
+        self.exists = True
+
+    def _count(self, row: list, terms: List[str], sign: int):
+        """Adds (sign 1) or removes (sign -1) a document's terms from the groups of its row"""
+        for group in _groups(row):
+            counts = self._load_group(group)
+            for term in terms:
+                counts[term] += sign
+                if counts[term] <= 0:
+                    del counts[term]
+
+    def update(self, doc_parser: DocumentParser) -> int:
+        """Brings the catalog up to date with the documents on disk. Only json files whose mtime
+        changed are hashed, and only those whose content changed are read. Removed, modified,
+        and re-split documents are subtracted from the vocabularies using their saved terms.
+        args:
+            doc_parser: parser for the collection, its stemming/stopping settings apply to the
+                token counts
+        returns: the number of documents that were read
+        """
+        jsons_path = os.path.join(doc_parser.path, "jsons/")
+        splits = {}
+        for split in SPLITS:
+            if os.path.exists(os.path.join(doc_parser.path, "splits/random", f"{split}.tsv")):
+                for id in doc_parser.read_split_ids(split):
+                    splits[id] = split
+
+        current = {
+            file[: -len(".json")]: os.path.getmtime(os.path.join(jsons_path, file))
+            for file in os.listdir(jsons_path)
+            if file.endswith(".json")
+        }
+        removed = [id for id in self.docs if id not in current]
+        touched = [id for id, mtime in current.items() if self.docs.get(id, [None])[0] != mtime]
+        moved = [
+            id for id, row in self.docs.items() if id in current and row[2] != splits.get(id, "")
+        ]
+        if not removed and not touched and not moved and self.exists:
+            return 0
+
+        for id in removed:
+            self._count(self.docs.pop(id), self._load_terms(id).pop(id, []), -1)
+
+        # at ingest the parser has usually just read everything already
+        cached = doc_parser.all_documents or {}
+        read = 0
+        for id in touched:
+            path = os.path.join(jsons_path, f"{id}.json")
+            with open(path, "rb") as f:
+                hash = md5(f.read()).hexdigest()
+            old = self.docs.get(id)
+            if old is not None and old[1] == hash:
+                # only the timestamp changed, a split change is handled with `moved`
+                old[0] = current[id]
+                continue
+            doc_terms = self._load_terms(id)
+            if old is not None:
+                self._count(old, doc_terms.get(id, []), -1)
+            doc = cached[id] if id in cached else doc_parser.read_file(path)
+            read += 1
+            terms = doc.content.split()
+            unique = sorted(set(terms))
+            self.docs[id] = [
+                current[id],
+                hash,
+                splits.get(id, ""),
+                doc.source,
+                doc.topic,
+                doc.bias_text,
+                len(terms),
+                len(unique),
+            ]
+            doc_terms[id] = unique
+            self._count(self.docs[id], unique, 1)
+
+        for id in moved:
+            row = self.docs[id]
+            if row[2] == splits.get(id, ""):
+                # already recounted with its new split above
+                continue
+            terms = self._load_terms(id).get(id, [])
+            self._count(row, terms, -1)
+            row[2] = splits.get(id, "")
+            self._count(row, terms, 1)
+
+        print(f"Read {read} documents from {jsons_path}, removed {len(removed)}")
+        self._save()
+        return read
+
+    def get(self, id: str) -> DocStats | None:
+        """Returns the catalog entry for a document ID"""
+        if id not in self.docs:
+            return None
+        return DocStats(id, *self.docs[id])
+
+    def rows(self, **filters: str | None) -> List[DocStats]:
+        """Returns the catalog entries that match every given facet, eg `rows(bias="left")`"""
+        filters = {k: v for k, v in filters.items() if v is not None}
+        rows = [DocStats(id, *row) for id, row in self.docs.items()]
+        return [r for r in rows if all(getattr(r, k) == v for k, v in filters.items())]
+
+    def summary(self, **filters: str | None) -> dict:
+        """Collection statistics for the documents that match every given facet
+        args:
+            filters: any of split, source, topic, or bias
+        returns: a dict with the document and token counts, vocabulary size (None when more than
+            one filter is given, vocabularies are only kept per facet value), the distribution of
+            document lengths in tokens, and the document counts for each facet
+        """
+        for facet in filters:
+            if facet not in FACETS:
+                raise Exception(f"Can't filter collection stats by {facet}")
+        rows = self.rows(**filters)
+        used = {k: v for k, v in filters.items() if v is not None}
+        if not used:
+            vocabulary = self.vocab_sizes.get("all", 0)
+        elif len(used) == 1:
+            [(facet, value)] = used.items()
+            vocabulary = self.vocab_sizes.get(f"{facet}:{value}", 0)
+        else:
+            vocabulary = None
+
+        lengths = sorted(r.tokens for r in rows)
+        distribution = {}
+        if lengths:
+            distribution = {
+                "min": lengths[0],
+                "p25": lengths[len(lengths) // 4],
+                "median": lengths[len(lengths) // 2],
+                "p75": lengths[len(lengths) * 3 // 4],
+                "p90": lengths[len(lengths) * 9 // 10],
+                "max": lengths[-1],
+                "mean": sum(lengths) / len(lengths),
+            }
+        return {
+            "documents": len(rows),
+            "tokens": sum(lengths),
+            "vocabulary": vocabulary,
+            "lengths": distribution,
+            "counts": {facet: Counter(getattr(r, facet) for r in rows) for facet in FACETS},
+        }
@@ -8,6 +8,10 @@ from nltk import word_tokenize
 from nltk.corpus import stopwords
 import tantivy
 
+SPLITS = ["train", "test", "valid"]
+# bias labels used in the split tsv files
+BIAS_LABELS = {"0": "left", "1": "center", "2": "right"}
+
 
 @dataclass
 class Document:
@@ -51,7 +55,7 @@ class DocumentParser:
             if file.endswith(".json"):
                 d = self.read_file(os.path.join(all_docs_path, file))
                 documents[d.ID] = d
-        self.documents = documents
+        self.all_documents = documents
         return documents
 
     def stem_doc(self, doc: Document) -> Document:
@@ -65,26 +69,39 @@ class DocumentParser:
         content = " ".join([w for w in word_tokenize(doc.content) if not w.lower() in stop_words])
         return Document(**{**doc.__dict__, "content": content})
 
-    def read_split(self, split: str) -> Dict[str, Document]:
-        """Reads all documents that belong to a split and returns a dict of Document objects
+    def read_split_ids(self, split: str) -> Dict[str, str]:
+        """Reads the IDs of the documents that belong to a split without reading the documents
         args:
             split: the name of the split to read, one of "train", "test", or "valid"
+        returns: a dict of document ID to bias label
         """
-        documents = {}
         split_path = os.path.join(self.path, "splits/random", f"{split}.tsv")
-        print(f"Reading {split} split from {split_path}")
-        bias = Counter()
+        ids = {}
         with open(split_path, "r") as f:
             for line in f.readlines()[1:]:
                 id, b = line.strip().split("\t")
-                bias[b] += 1
-                documents[id] = self.read_file(
-                    os.path.join(self.path, "jsons/", f"{id}.json")
-                )
-        self.stats["bias_counts"] = {
-            "left": bias["0"],
-            "center": bias["1"],
-            "right": bias["2"],
+                ids[id] = BIAS_LABELS[b]
+        return ids
+
+    def read_split(self, split: str) -> Dict[str, Document]:
+        """Reads all documents that belong to a split and returns a dict of Document objects
+        args:
+            split: the name of the split to read, one of "train", "test", or "valid"
+        """
+        split_path = os.path.join(self.path, "splits/random", f"{split}.tsv")
+        print(f"Reading {split} split from {split_path}")
+        ids = self.read_split_ids(split)
+        # reuse documents from `read_all` when they've already been parsed
+        cached = self.all_documents or {}
+        documents = {}
+        for id in ids:
+            path = os.path.join(self.path, "jsons/", f"{id}.json")
+            documents[id] = cached[id] if id in cached else self.read_file(path)
+        bias = Counter(ids.values())
+        self.stats.setdefault("bias_counts", {})[split] = {
+            "left": bias["left"],
+            "center": bias["center"],
+            "right": bias["right"],
         }
         return documents
 
@@ -1,3 +1,4 @@
+from hashlib import md5
 from math import log10
 import os
 from typing import Callable, Dict, Tuple
@@ -14,9 +15,12 @@ class NaiveBayes:
 
     pr: Callable[[str, str], float] | None
     doc_parser: DocumentParser
+    checksum: str | None
+    """md5 of the saved params, identifies which model produced a prediction"""
 
     def __init__(self, file_path: str, doc_parser: DocumentParser):
         self.pr = None
+        self.checksum = None
         self.sentiment_stats = None
         self.doc_parser = doc_parser
         self.file_path = file_path
@@ -92,12 +96,18 @@ class NaiveBayes:
 
         return params
 
+    def params_checksum(self) -> str | None:
+        """Returns the md5 of the saved params without loading them, or None if the classifier
+        hasn't been trained yet"""
+        path = os.path.join(self.file_path, "params.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return md5(f.read()).hexdigest()
+
     def load_params_or_train(self):
         """Loads the parameters from a file if it exists, otherwise trains the classifier and saves
-        the params"""
-        if self.sentiment_stats is None:
-            raise Exception("Must create/load sentiment stats before training")
-
+        the params. Sentiment stats are only needed when training."""
         path = os.path.join(self.file_path, "params.json")
         if os.path.exists(path):
             print(f"Loading params from {self.file_path}")
@@ -108,6 +118,8 @@ class NaiveBayes:
             with open(os.path.join(self.file_path, "params.json"), "w") as f:
                 json.dump(params, f)
 
+        self.checksum = self.params_checksum()
+
         # a function that will return P(word | sentiment) based on 'term_stats'
         def pr(word, sentiment):
             if word in params[sentiment]["counts"]:
@@ -147,11 +159,18 @@ class NaiveBayes:
                 probabilities[sentiment] += log10(self.pr(word, sentiment))
         return probabilities
 
-    def predict_scale_doc(self, doc: Document) -> list:
+    def predict_scale_doc(
+        self, doc: Document, doc_sentiments: Dict[str, float] | None = None
+    ) -> list:
         """Predicts a sentiment scale for a doc, outputs a value on the scale of -1 <= val <= 1,
-        -1 being left, 0 being center, 1 being right"""
+        -1 being left, 0 being center, 1 being right
+        args:
+            doc: the document to predict
+            doc_sentiments: output of `predict_doc` for this doc, if it's already been computed
+        """
 
-        doc_sentiments = self.predict_doc(doc)
+        if doc_sentiments is None:
+            doc_sentiments = self.predict_doc(doc)
         doc_len = len(doc.content.split(" "))
 
         sentiment_predicted = max(doc_sentiments.items(), key=lambda x: x[1])
@@ -0,0 +1,11 @@
+import json
+import os
+
+
+def write_json(path: str, data):
+    """Writes json to a temp file and moves it into place, so a crash never leaves a partially
+    written file behind"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)